@@ -1,3 +1,249 @@
-from django.test import TestCase
+from django.test import SimpleTestCase
 
-# Create your tests here.
+from .views import FlowLangGenerator, FlowLangParser, FlowLangValidator
+
+
+class FlowLangValidatorTests(SimpleTestCase):
+    def setUp(self):
+        self.validator = FlowLangValidator()
+
+    def repair(self, flowlang_code):
+        result = self.validator.validate_and_repair(flowlang_code)
+        self.assertTrue(result['success'])
+        return result['flowlang_code'], result['repairs']
+
+    def wrap(self, body):
+        return 'Diagram [color: blue, layout: horizontal, title: "Test"] {\n' + body + '\n}'
+
+    def test_normalizes_identifiers(self):
+        code, repairs = self.repair(self.wrap(
+            '  Input Section {\n'
+            '    Load Data [type: activity, icon: database, label: "Load"]\n'
+            '  }\n'
+            '  Load Data > Load Data'
+        ))
+        self.assertIn('  InputSection {', code)
+        self.assertIn('    LoadData [type: activity, icon: database, label: "Load"]', code)
+        self.assertIn('  LoadData > LoadData', code)
+        self.assertIn('Renamed node "Load Data" to LoadData', repairs)
+
+    def test_resolves_references_to_nearest_name(self):
+        code, repairs = self.repair(self.wrap(
+            '  Report [type: event, icon: flag, label: "Report"]\n'
+            '  CleanData [type: activity, icon: filter, label: "Clean"]\n'
+            '  cleandata > Reprot'
+        ))
+        self.assertIn('  CleanData > Report', code)
+        self.assertIn('Resolved reference "Reprot" to Report', repairs)
+
+    def test_drops_references_without_close_match(self):
+        code, repairs = self.repair(self.wrap(
+            '  Report [type: event, icon: flag, label: "Report"]\n'
+            '  Report > Ghost'
+        ))
+        self.assertNotIn('Ghost', code)
+        self.assertIn('Removed connection to undeclared node "Ghost"', repairs)
+
+    def test_falls_back_for_unknown_type_and_icon(self):
+        code, _ = self.repair(self.wrap(
+            '  A [type: activty, icon: databse, label: "A"]\n'
+            '  B [type: banana, icon: unicorn, label: "B"]\n'
+            '  C [icon: flag, label: "C"]'
+        ))
+        self.assertIn('  A [type: activity, icon: database, label: "A"]', code)
+        self.assertIn('  B [type: activity, icon: circle, label: "B"]', code)
+        self.assertIn('  C [type: activity, icon: flag, label: "C"]', code)
+
+    def test_removes_duplicate_nodes_and_edges(self):
+        code, repairs = self.repair(self.wrap(
+            '  A [type: event, icon: flag, label: "First"]\n'
+            '  A [type: note, icon: x, label: "Second"]\n'
+            '  B [type: event, icon: flag, label: "B"]\n'
+            '  A > B\n'
+            '  A > B'
+        ))
+        self.assertNotIn('Second', code)
+        self.assertEqual(code.count('A > B'), 1)
+        self.assertIn('Removed duplicate declaration of node A', repairs)
+        self.assertIn('Removed duplicate connection A > B', repairs)
+
+    def test_closes_unbalanced_braces(self):
+        code, repairs = self.repair(
+            'Diagram [color: blue, layout: horizontal, title: "Test"] {\n'
+            '  Section {\n'
+            '    A [type: event, icon: flag, label: "A"]\n'
+        )
+        self.assertTrue(code.endswith('label: "A"]\n}\n}'))
+        self.assertIn('Added 2 missing closing brace(s)', repairs)
+
+    def test_ignores_braces_in_comments(self):
+        code, repairs = self.repair(self.wrap(
+            '  // Section {\n'
+            '  A [type: event, icon: flag, label: "A"]'
+        ))
+        self.assertEqual(code.count('}'), 1)
+        self.assertEqual(repairs, [])
+
+    def test_leaves_header_with_brace_on_next_line(self):
+        flowlang_code = (
+            'Diagram [color: blue, layout: horizontal, title: "X"]\n'
+            '{\n'
+            '  A [type: event, icon: flag, label: "A"]\n'
+            '}'
+        )
+        code, repairs = self.repair(flowlang_code)
+        self.assertEqual(code, flowlang_code)
+        self.assertEqual(repairs, [])
+        nodes = FlowLangParser().parse_flowlang(code)['nodes']
+        self.assertEqual([node['id'] for node in nodes], ['node-A-0'])
+
+    def test_does_not_resolve_endpoints_into_self_loop(self):
+        code, repairs = self.repair(self.wrap(
+            '  Start [type: event, icon: flag, label: "Start"]\n'
+            '  AB [type: activity, icon: cpu, label: "AB"]\n'
+            '  Start > Star\n'
+            '  AB > ABC'
+        ))
+        self.assertNotIn('Start > Start', code)
+        self.assertNotIn('AB > AB', code)
+        self.assertIn('Removed connection to undeclared node "Star"', repairs)
+        self.assertIn('Removed connection to undeclared node "ABC"', repairs)
+        self.assertFalse(any(repair.startswith('Resolved reference') for repair in repairs))
+
+    def test_splits_chained_arrows(self):
+        code, _ = self.repair(self.wrap(
+            '  Check [type: decision, icon: filter, label: "Check"]\n'
+            '  Done [type: event, icon: check, label: "Done"]\n'
+            '  Fail [type: event, icon: x, label: "Fail"]\n'
+            '  Check > Done --> Fail : retry'
+        ))
+        self.assertIn('  Check > Done\n  Done --> Fail : retry', code)
+        self.assertNotIn('Check > Fail', code)
+
+    def test_keeps_trailing_comments(self):
+        code, repairs = self.repair(self.wrap(
+            '  UserLogin [type: event, icon: users, label: "Login"] // start\n'
+            '  Other [type: event, icon: flag, label: "Other"]\n'
+            '  UserLogin > Other   // happy path'
+        ))
+        self.assertIn('  UserLogin [type: event, icon: users, label: "Login"] // start', code)
+        self.assertIn('  UserLogin > Other   // happy path', code)
+        self.assertEqual(repairs, [])
+
+    def test_leaves_labels_with_brackets_intact(self):
+        line = '  A [type: event, icon: flag, label: "List [draft]"]'
+        code, _ = self.repair(self.wrap(line))
+        self.assertIn(line, code)
+
+    def test_valid_input_is_unchanged(self):
+        flowlang_code = self.wrap(
+            '  // Events Section\n'
+            '  Events {\n'
+            '    Start [type: event, icon: flag, label: "Start"]\n'
+            '    End [type: event, icon: check, label: "End"]\n'
+            '    Review [type: note, icon: lightbulb, label: "Review"]\n'
+            '  }\n'
+            '\n'
+            '  // Connections\n'
+            '  Start > End\n'
+            '  Start --> Review : skip\n'
+            '  End **>** Start'
+        )
+        code, repairs = self.repair(flowlang_code)
+        self.assertEqual(code, flowlang_code)
+        self.assertEqual(repairs, [])
+
+    def test_generator_output_is_unchanged(self):
+        nodes = [
+            {'id': 'node-1', 'data': {'label': 'Receive order', 'type': 'event', 'icon': '🚩'}},
+            {'id': 'node-2', 'data': {'label': 'Check stock', 'type': 'activity', 'icon': '🗄️'}},
+            {'id': 'node-3', 'data': {'label': 'Ship', 'type': 'activity', 'icon': '📦'}},
+        ]
+        edges = [
+            {'source': 'node-1', 'target': 'node-2'},
+            {'source': 'node-2', 'target': 'node-3', 'label': 'in stock'},
+            {'source': 'node-3', 'target': 'node-1', 'animated': True},
+        ]
+        generated = FlowLangGenerator().generate_flowlang_from_diagram(nodes, edges, 'Orders')
+        code, repairs = self.repair(generated['flowlang_code'])
+        self.assertEqual(code, generated['flowlang_code'])
+        self.assertEqual(repairs, [])
+
+
+class FlowLangParserSectionTests(SimpleTestCase):
+    flowlang_code = '''Diagram [color: blue, layout: horizontal, title: "Sections"] {
+  Start [type: event, icon: flag, label: "Start"]
+  A {
+    A1 [type: activity, icon: cpu, label: "A1"]
+    A2 [type: activity, icon: cpu, label: "A2"]
+  }
+  B {
+    B1 [type: event, icon: check, label: "B1"]
+  }
+  Start > A1
+  A1 > A2
+  A1 > B1
+  A2 > B1
+}'''
+
+    def setUp(self):
+        self.parser = FlowLangParser()
+
+    def test_collapsed_nodes_do_not_overlap(self):
+        result = self.parser.parse_flowlang(self.flowlang_code, collapsed=True)
+        self.assertTrue(result['success'])
+        self.assertEqual(
+            [node['id'] for node in result['nodes']],
+            ['node-Start-0', 'section-A', 'section-B']
+        )
+        positions = [(node['position']['x'], node['position']['y']) for node in result['nodes']]
+        self.assertEqual(len(positions), len(set(positions)))
+
+    def test_collapsed_edges_are_aggregated(self):
+        result = self.parser.parse_flowlang(self.flowlang_code, collapsed=True)
+        edges = {edge['id']: edge for edge in result['edges']}
+        self.assertEqual(set(edges), {'node-Start-0-section-A', 'section-A-section-B'})
+        self.assertEqual(edges['section-A-section-B']['data']['count'], 2)
+
+    def test_expanded_section_keeps_full_layout_ids(self):
+        full = self.parser.parse_flowlang(self.flowlang_code)
+        expanded = self.parser.parse_flowlang(self.flowlang_code, section='A')
+        full_ids = {node['id'] for node in full['nodes'] if node['data']['section'] == 'A'}
+        self.assertEqual({node['id'] for node in expanded['nodes']}, full_ids)
+        self.assertIn('node-A1-1-section-B', {edge['id'] for edge in expanded['edges']})
+
+    def test_url_label_stays_in_its_section(self):
+        flowlang_code = (
+            'Diagram [color: blue, layout: horizontal, title: "Api"] {\n'
+            '  Api {\n'
+            '    Fetch [type: activity, icon: cpu, label: "GET https://example.com"]\n'
+            '  }\n'
+            '}'
+        )
+        result = self.parser.parse_flowlang(flowlang_code)
+        self.assertEqual(result['nodes'][0]['data']['section'], 'Api')
+        self.assertEqual(result['sections'][0]['node_count'], 1)
+
+        collapsed = self.parser.parse_flowlang(flowlang_code, collapsed=True)
+        self.assertEqual([node['id'] for node in collapsed['nodes']], ['section-Api'])
+
+    def test_view_treats_empty_section_as_full_parse(self):
+        response = self.client.post('/api/parse-flowlang/', {
+            'flowlang_code': self.flowlang_code,
+            'section': '',
+        })
+        self.assertTrue(response.json()['success'])
+        self.assertEqual(len(response.json()['nodes']), 4)
+
+    def test_view_parses_collapsed_flag_from_form_data(self):
+        response = self.client.post('/api/parse-flowlang/', {
+            'flowlang_code': self.flowlang_code,
+            'collapsed': 'false',
+        })
+        self.assertEqual(len(response.json()['nodes']), 4)
+
+        response = self.client.post('/api/parse-flowlang/', {
+            'flowlang_code': self.flowlang_code,
+            'collapsed': 'true',
+        })
+        self.assertEqual(len(response.json()['nodes']), 3)
@@ -2,6 +2,7 @@
 import os
 import json
 import re
+import difflib
 import requests
 from django.http import JsonResponse
 from rest_framework.decorators import api_view
@@ -153,10 +154,17 @@ class FlowLangParser:
             'circle': '⚪'
         }
     
-    def parse_flowlang(self, flowlang_code):
+    def parse_flowlang(self, flowlang_code, collapsed=False, section=None):
+        """
+        Parse FlowLang code into React Flow nodes and edges.
+        With collapsed=True every top-level section becomes a single summary
+        node; with section=<name> only that section's contents are returned
+        so the client can expand it lazily.
+        """
         try:
             nodes = []
             edges = []
+            sections, node_sections = self._parse_sections(flowlang_code)
             
             # Extract diagram info
             diagram_match = re.search(r'(\w+)\s*\[([^\]]+)\]\s*{', flowlang_code)
@@ -219,7 +227,8 @@ class FlowLangParser:
                         'textColor': self._get_text_color(node_type),
                         'iconColor': self._get_icon_color(node_type),
                         # Legacy support for old color property
-                        'color': self._get_icon_color(node_type)
+                        'color': self._get_icon_color(node_type),
+                        'section': node_sections.get(node_name)
                     }
                 })
                 
@@ -267,9 +276,29 @@ class FlowLangParser:
                             }
                         })
             
+            section_info = [
+                {
+                    'id': f"section-{name}",
+                    'name': name,
+                    'node_count': sum(1 for node in nodes if node['data']['section'] == name)
+                }
+                for name in sections
+            ]
+            
+            if section is not None:
+                if section not in sections:
+                    return {
+                        'error': f'Unknown section: {section}',
+                        'success': False
+                    }
+                nodes, edges = self._expand_section(nodes, edges, section)
+            elif collapsed:
+                nodes, edges = self._collapse_sections(nodes, edges, section_info)
+            
             return {
                 'nodes': nodes,
                 'edges': edges,
+                'sections': section_info,
                 'diagram_info': diagram_info,
                 'success': True
             }
@@ -280,6 +309,125 @@ class FlowLangParser:
                 'success': False
             }
     
+    def _parse_sections(self, flowlang_code):
+        """
+        Walk the brace structure and return the top-level section names in
+        order, plus a mapping of node name to the top-level section holding it.
+        Nested sections are folded into their top-level parent.
+        """
+        sections = []
+        node_sections = {}
+        stack = []
+        
+        for line in flowlang_code.split('\n'):
+            # Blank out strings first so a "//" inside a label is not taken as a comment
+            code = re.sub(r'"[^"]*"', '""', line).split('//')[0]
+            
+            node_match = re.match(r'\s*(\w+)\s*\[([^\]]*)\]', code)
+            if node_match and '{' not in code and 'type:' in node_match.group(2):
+                current = next((entry for entry in stack if entry), None)
+                node_sections.setdefault(node_match.group(1), current)
+            
+            for _ in range(code.count('{')):
+                section_match = re.match(r'\s*(\w+)\s*{', code)
+                if '[' in code or not section_match:
+                    # Diagram declaration (or anything else without a section name)
+                    stack.append(None)
+                elif any(stack):
+                    stack.append(next(entry for entry in stack if entry))
+                else:
+                    name = section_match.group(1)
+                    if name not in sections:
+                        sections.append(name)
+                    stack.append(name)
+            for _ in range(code.count('}')):
+                if stack:
+                    stack.pop()
+        
+        return sections, node_sections
+    
+    def _collapse_sections(self, nodes, edges, section_info):
+        """Replace each section with one summary node and aggregate its edges"""
+        collapsed_nodes = []
+        node_to_group = {}
+        
+        # Nodes outside any section stay on the canvas, ahead of the summaries
+        for node in nodes:
+            section_name = node['data']['section']
+            if section_name:
+                node_to_group[node['id']] = f"section-{section_name}"
+            else:
+                node_to_group[node['id']] = node['id']
+                collapsed_nodes.append(dict(node))
+        
+        for info in section_info:
+            collapsed_nodes.append({
+                'id': info['id'],
+                'type': 'custom',
+                'data': {
+                    'label': info['name'],
+                    'type': 'section',
+                    'icon': self.icons_map['layers'],
+                    'backgroundColor': self._get_background_color('section'),
+                    'textColor': self._get_text_color('section'),
+                    'iconColor': self._get_icon_color('section'),
+                    'color': self._get_icon_color('section'),
+                    'section': info['name'],
+                    'node_count': info['node_count'],
+                    'collapsed': True
+                }
+            })
+        
+        # Lay everything out again in one pass so summaries and loose nodes don't overlap
+        for index, node in enumerate(collapsed_nodes):
+            node['position'] = {'x': 100 + (index % 3) * 300, 'y': 100 + (index // 3) * 200}
+        
+        return collapsed_nodes, self._aggregate_edges(edges, node_to_group)
+    
+    def _expand_section(self, nodes, edges, section):
+        """
+        Return the nodes of one section with their internal edges, plus the
+        edges crossing its boundary re-pointed at the other sections' summary nodes
+        """
+        section_nodes = [node for node in nodes if node['data']['section'] == section]
+        node_to_group = {}
+        for node in nodes:
+            section_name = node['data']['section']
+            if section_name and section_name != section:
+                node_to_group[node['id']] = f"section-{section_name}"
+            else:
+                node_to_group[node['id']] = node['id']
+        
+        section_ids = {node['id'] for node in section_nodes}
+        touching = [
+            edge for edge in edges
+            if edge['source'] in section_ids or edge['target'] in section_ids
+        ]
+        return section_nodes, self._aggregate_edges(touching, node_to_group)
+    
+    def _aggregate_edges(self, edges, node_to_group):
+        """Re-point edges at their groups, merging parallel edges and dropping internal ones"""
+        aggregated = {}
+        for edge in edges:
+            source = node_to_group.get(edge['source'], edge['source'])
+            target = node_to_group.get(edge['target'], edge['target'])
+            if source == target and source.startswith('section-'):
+                continue
+            
+            edge_id = f"{source}-{target}"
+            if edge_id in aggregated:
+                aggregated[edge_id]['data']['count'] += 1
+                aggregated[edge_id]['animated'] = aggregated[edge_id]['animated'] or edge['animated']
+                continue
+            
+            aggregated[edge_id] = dict(edge, id=edge_id, source=source, target=target, data={'count': 1})
+        
+        for edge in aggregated.values():
+            if edge['data']['count'] > 1:
+                edge['label'] = f"{edge['data']['count']} connections"
+        
+        return list(aggregated.values())
+    
     def _get_background_color(self, node_type):
         colors = {
             'event': '#F0FDF4',
@@ -308,6 +456,232 @@ class FlowLangParser:
         return colors.get(node_type, '#6B7280')
 
 
+class FlowLangValidator:
+    """
+    Semantic validation and deterministic repair of FlowLang code.
+    Fixes the common ways LLM output goes wrong so it can be used as-is
+    instead of paying for another generation round-trip.
+    """
+
+    node_types = ['event', 'activity', 'note', 'decision']
+
+    def __init__(self):
+        self.valid_icons = list(FlowLangParser().icons_map.keys())
+
+    def validate_and_repair(self, flowlang_code):
+        try:
+            repairs = []
+            lines = flowlang_code.split('\n')
+
+            # First pass: collect declared node names so connections can be
+            # resolved regardless of where they appear
+            declared = []
+            for line in lines:
+                node = self._match_node(line)
+                if node:
+                    name = self._normalize_identifier(node.group(2))
+                    if name not in declared:
+                        declared.append(name)
+            name_keys = {self._name_key(name): name for name in declared}
+
+            # Second pass: rewrite lines that need repairs
+            repaired_lines = []
+            seen_nodes = set()
+            seen_edges = set()
+            for line in lines:
+                stripped = line.strip()
+                if not stripped or stripped.startswith('//'):
+                    repaired_lines.append(line)
+                    continue
+
+                node = self._match_node(line)
+                if node:
+                    repaired = self._repair_node(node, seen_nodes, repairs)
+                    if repaired is not None:
+                        repaired_lines.append(repaired)
+                    continue
+
+                section = re.match(r'^(\s*)([^\[\]{}>:"]+?)\s*\{\s*$', line)
+                if section:
+                    name = self._normalize_identifier(section.group(2))
+                    if name != section.group(2):
+                        repairs.append(f'Renamed section "{section.group(2)}" to {name}')
+                    repaired_lines.append(f'{section.group(1)}{name} {{')
+                    continue
+
+                if '>' in stripped and '[' not in stripped:
+                    repaired_lines.extend(self._repair_connection(
+                        line, declared, name_keys, seen_edges, repairs
+                    ))
+                    continue
+
+                repaired_lines.append(line)
+
+            # Close any braces the model left open
+            code_only = '\n'.join(
+                re.sub(r'"[^"]*"', '', line).split('//')[0] for line in repaired_lines
+            )
+            open_braces = code_only.count('{') - code_only.count('}')
+            if open_braces > 0:
+                while repaired_lines and not repaired_lines[-1].strip():
+                    repaired_lines.pop()
+                repaired_lines.extend(['}'] * open_braces)
+                repairs.append(f'Added {open_braces} missing closing brace(s)')
+
+            return {
+                'flowlang_code': '\n'.join(repaired_lines).strip(),
+                'repairs': repairs,
+                'success': True
+            }
+
+        except Exception as e:
+            return {
+                'error': str(e),
+                'success': False
+            }
+
+    def _match_node(self, line):
+        """Match a node declaration, ignoring the Diagram header"""
+        match = re.match(r'^(\s*)([^\[\]{}>:"/]+?)\s*\[([^\]]*)\](.*)$', line)
+        if not match or '{' in match.group(4):
+            return None
+        # The header may have its opening brace on the next line
+        attrs = match.group(3)
+        if 'type:' not in attrs and re.search(r'\b(title|layout|color):', attrs):
+            return None
+        return match
+
+    def _repair_node(self, match, seen_nodes, repairs):
+        indent, raw_name, attrs, trailing = match.groups()
+        name = self._normalize_identifier(raw_name)
+
+        if name in seen_nodes:
+            repairs.append(f'Removed duplicate declaration of node {name}')
+            return None
+        seen_nodes.add(name)
+
+        # A "]" inside a quoted label ends the match early, leave such lines alone
+        if attrs.count('"') % 2:
+            return match.group(0)
+
+        if name != raw_name:
+            repairs.append(f'Renamed node "{raw_name}" to {name}')
+
+        # Type: the parser skips nodes without one entirely
+        type_match = re.search(r'type:\s*([^,\]]+)', attrs)
+        if not type_match:
+            attrs = 'type: activity, ' + attrs.strip()
+            repairs.append(f'Added missing type to node {name}')
+        else:
+            node_type = type_match.group(1).strip()
+            if node_type not in self.node_types:
+                fixed = self._closest(node_type.lower(), self.node_types) or 'activity'
+                attrs = attrs[:type_match.start(1)] + fixed + attrs[type_match.end(1):]
+                repairs.append(f'Replaced unknown type "{node_type}" with {fixed} on node {name}')
+
+        icon_match = re.search(r'icon:\s*([^,\]]+)', attrs)
+        if icon_match:
+            icon = icon_match.group(1).strip()
+            if icon not in self.valid_icons:
+                fixed = self._closest(icon.lower(), self.valid_icons) or 'circle'
+                attrs = attrs[:icon_match.start(1)] + fixed + attrs[icon_match.end(1):]
+                repairs.append(f'Replaced unknown icon "{icon}" with {fixed} on node {name}')
+
+        return f'{indent}{name} [{attrs.strip()}]{trailing}'
+
+    def _repair_connection(self, line, declared, name_keys, seen_edges, repairs):
+        """
+        Repair a connection line, returning the lines that replace it.
+        Chained arrows (A > B > C) are split into one connection per arrow.
+        """
+        parts = re.split(r'(\s+//.*)$', line, maxsplit=1)
+        text, comment = parts[0], parts[1] if len(parts) > 1 else ''
+        indent = re.match(r'\s*', text).group(0)
+        head, _, label = text.strip().partition(':')
+        label = label.strip()
+
+        # Alternating names and operators: [name, op, name, op, name, ...]
+        tokens = re.split(r'\s*(\*\*>\*\*|-->|>)\s*', head.strip())
+        names, operators = tokens[0::2], tokens[1::2]
+        if not operators or not all(re.search(r'\w', name) for name in names):
+            return [line]
+        if len(operators) > 1:
+            repairs.append(f'Split chained connection "{head.strip()}"')
+
+        resolved = [self._resolve_name(name, declared, name_keys) for name in names]
+        reported = set()
+
+        connections = []
+        for index, operator in enumerate(operators):
+            source, target = resolved[index], resolved[index + 1]
+            # A label after the colon belongs to the last arrow of a chain
+            edge_label = label if index == len(operators) - 1 else ''
+
+            if source is None or target is None:
+                missing = names[index] if source is None else names[index + 1]
+                repairs.append(f'Removed connection to undeclared node "{missing}"')
+                continue
+
+            # Fuzzy matching must not fold two different references into a self-loop
+            if source == target and self._name_key(names[index]) != self._name_key(names[index + 1]):
+                dangling = names[index] if names[index] != source else names[index + 1]
+                repairs.append(f'Removed connection to undeclared node "{dangling}"')
+                continue
+
+            for position in (index, index + 1):
+                raw, name = names[position], resolved[position]
+                if raw != name and position not in reported:
+                    repairs.append(f'Resolved reference "{raw}" to {name}')
+                    reported.add(position)
+
+            if (source, target) in seen_edges:
+                repairs.append(f'Removed duplicate connection {source} > {target}')
+                continue
+            seen_edges.add((source, target))
+
+            # A labelled arrow without a label is not parsed, fall back to a plain one
+            if operator == '-->' and not edge_label:
+                operator = '>'
+                repairs.append(f'Converted unlabelled --> to > for {source} > {target}')
+
+            connection = f'{indent}{source} {operator} {target}'
+            if edge_label:
+                connection += f' : {edge_label}'
+            connections.append(connection)
+
+        if connections and comment:
+            connections[-1] += comment
+        return connections
+
+    def _resolve_name(self, raw_name, declared, name_keys):
+        """Map a referenced name onto a declared node, or None if nothing is close"""
+        name = self._normalize_identifier(raw_name)
+        if name in declared:
+            return name
+        key = self._name_key(name)
+        if key in name_keys:
+            return name_keys[key]
+        closest = self._closest(key, list(name_keys.keys()))
+        return name_keys[closest] if closest else None
+
+    def _normalize_identifier(self, raw_name):
+        """Convert a name to a FlowLang identifier (CamelCase, alphanumeric)"""
+        parts = [part for part in re.split(r'[^a-zA-Z0-9]+', raw_name.strip()) if part]
+        if not parts:
+            return 'Node'
+        identifier = parts[0] + ''.join(part[0].upper() + part[1:] for part in parts[1:])
+        if not identifier[0].isalpha():
+            identifier = 'Node' + identifier
+        return identifier
+
+    def _name_key(self, name):
+        return name.lower().replace('_', '')
+
+    def _closest(self, value, candidates):
+        matches = difflib.get_close_matches(value, candidates, n=1, cutoff=0.6)
+        return matches[0] if matches else None
+
+
 @api_view(['POST'])
 def generate_flowlang(request):
     try:
@@ -393,10 +767,17 @@ User request: {user_prompt}"""
         llm_output = response_data["choices"][0]["message"]["content"]
         flowlang_code = re.sub(r"```(?:flowlang)?|```", "", llm_output).strip()
         
-        return Response({
-            'flowlang_code': flowlang_code,
-            'success': True
-        })
+        # Repair common LLM mistakes locally instead of asking for a regeneration
+        validator = FlowLangValidator()
+        result = validator.validate_and_repair(flowlang_code)
+        if not result['success']:
+            return Response({
+                'flowlang_code': flowlang_code,
+                'repairs': [],
+                'success': True
+            })
+        
+        return Response(result)
         
     except requests.exceptions.RequestException as e:
         print(f"GROQ API Request Error: {str(e)}")
@@ -418,6 +799,9 @@ def parse_flowlang(request):
     try:
         data = request.data
         flowlang_code = data.get('flowlang_code', '')
+        # Form-encoded requests send booleans as strings
+        collapsed = str(data.get('collapsed', False)).lower() in ('true', '1')
+        section = data.get('section') or None
         
         if not flowlang_code:
             return Response({
@@ -425,7 +809,7 @@ def parse_flowlang(request):
             }, status=status.HTTP_400_BAD_REQUEST)
         
         parser = FlowLangParser()
-        result = parser.parse_flowlang(flowlang_code)
+        result = parser.parse_flowlang(flowlang_code, collapsed=collapsed, section=section)
         
         return Response(result)
         